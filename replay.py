@@ -0,0 +1,623 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+import bot as bot_module
+
+
+# ----------------------
+# Поток событий
+# ----------------------
+LOG_LINE_RE = re.compile(r"^\[(?P<ts>[^\]]+)\] (?P<kind>[A-Z-]+) -> (?P<rest>.*)$")
+LOG_FIELD_RE = re.compile(r"^(User|By|Reason|Total|Time|Channel|Content|After): (.*)$", re.DOTALL)
+LOG_USER_RE = re.compile(r"^(.*) \((\d+)\)$")
+LOG_TS_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+
+# Типы строк лога, которые соответствуют командам. AUTO-UNBAN пишет таймер,
+# поэтому при воспроизведении он появится сам.
+REPLAYABLE_KINDS = {"WARN", "WARNINGS", "MUTE", "UNMUTE", "BAN", "UNBAN", "KICK", "SAY"}
+
+# Глубины хватает, чтобы из json.load в потоке executor'а дойти до кадра bot.py
+TRACE_DEPTH = 10
+
+
+class ReplayEvent:
+    def __init__(self, offset: float, command: str, moderator: str, user: str | None = None,
+                 user_id: int | None = None, reason: str = "Не указана", duration: str | None = None,
+                 content: str = ""):
+        self.offset = offset
+        self.command = command
+        self.moderator = moderator
+        self.user = user
+        self.user_id = user_id
+        self.reason = reason
+        self.duration = duration
+        self.content = content
+
+
+def parse_log_fields(rest: str) -> dict:
+    # Причина/текст могут содержать " | ", поэтому неизвестные куски приклеиваем к предыдущему полю
+    fields: dict = {}
+    last_key = None
+    for part in rest.split(" | "):
+        m = LOG_FIELD_RE.match(part)
+        if m and m.group(1) not in fields:
+            last_key = m.group(1)
+            fields[last_key] = m.group(2)
+        elif last_key is not None:
+            fields[last_key] += " | " + part
+    return fields
+
+
+def load_log_events(path: str, max_gap: float) -> list[ReplayEvent]:
+    events: list[ReplayEvent] = []
+    offset = 0.0
+    prev_ts = None
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            m = LOG_LINE_RE.match(raw.rstrip("\n"))
+            if not m or m.group("kind") not in REPLAYABLE_KINDS:
+                continue
+            try:
+                ts = datetime.strptime(m.group("ts"), LOG_TS_FORMAT)
+            except ValueError:
+                continue
+            if prev_ts is not None:
+                # Долгие простои сжимаем, иначе реплей за неделю логов идёт неделю
+                offset += min(max(0.0, (ts - prev_ts).total_seconds()), max_gap)
+            prev_ts = ts
+
+            kind = m.group("kind")
+            fields = parse_log_fields(m.group("rest"))
+            user = user_id = None
+            if "User" in fields:
+                um = LOG_USER_RE.match(fields["User"])
+                if um is None:
+                    continue
+                user, user_id = um.group(1), int(um.group(2))
+
+            duration = None
+            time_field = fields.get("Time")
+            if kind == "MUTE":
+                duration = time_field or "600"
+            elif kind == "BAN":
+                duration = "p" if time_field in (None, "permanent") else time_field
+
+            events.append(ReplayEvent(
+                offset,
+                kind.lower(),
+                fields.get("By", "moderator"),
+                user=user,
+                user_id=user_id,
+                reason=fields.get("Reason", "Не указана"),
+                duration=duration,
+                content=fields.get("Content", ""),
+            ))
+    return events
+
+
+def generate_profile(profile: str, count: int, duration: float, users: int, seed: int) -> list[ReplayEvent]:
+    rng = random.Random(seed)
+    moderators = [f"moderator{i}" for i in range(1, 4)]
+    members = [(f"user{i}", 100000000000000000 + i) for i in range(1, users + 1)]
+
+    if profile == "raid":
+        # Тихий фон, затем в средней трети — волна варнов по небольшой группе рейдеров,
+        # которые быстро доходят до авто-мута и авто-бана
+        raiders = members[: max(1, users // 5)]
+        weights = [("warn", 80), ("mute", 8), ("kick", 6), ("ban", 4), ("warnings", 2)]
+        offsets = []
+        for _ in range(count):
+            if rng.random() < 0.8:
+                offsets.append(rng.uniform(duration / 3, 2 * duration / 3))
+            else:
+                offsets.append(rng.uniform(0, duration))
+    else:
+        raiders = members
+        weights = [("warn", 55), ("warnings", 15), ("mute", 10), ("unmute", 5),
+                   ("unwarn", 5), ("kick", 5), ("ban", 5)]
+        offsets = [rng.uniform(0, duration) for _ in range(count)]
+    offsets.sort()
+
+    commands, command_weights = zip(*weights)
+    events: list[ReplayEvent] = []
+    for offset in offsets:
+        command = rng.choices(commands, command_weights)[0]
+        name, uid = rng.choice(raiders if command == "warn" else members)
+        duration_arg = None
+        if command == "mute":
+            duration_arg = rng.choice(["60", "10m", "1h"])
+        elif command == "ban":
+            duration_arg = rng.choice(["1h", "1d", "p"])
+        events.append(ReplayEvent(
+            offset,
+            command,
+            rng.choice(moderators),
+            user=name,
+            user_id=uid,
+            reason=rng.choice(["Спам", "Флуд", "Оскорбления", "Реклама"]),
+            duration=duration_arg,
+        ))
+    return events
+
+
+# ----------------------
+# Заглушки объектов Discord
+# ----------------------
+class FakePermissions:
+    def __init__(self, moderator: bool):
+        self.administrator = moderator
+        self.kick_members = moderator
+        self.ban_members = moderator
+        self.manage_guild = moderator
+        self.manage_messages = moderator
+
+
+class FakeAPI:
+    """Имитирует задержку REST API Discord (в реальных секундах, без ускорения)."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def call(self) -> None:
+        self.calls += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+
+
+class FakeChannel:
+    def __init__(self, api: FakeAPI, channel_id: int, name: str):
+        self.api = api
+        self.id = channel_id
+        self.name = name
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        await self.api.call()
+        self.sent += 1
+
+    async def set_permissions(self, target, **kwargs):
+        await self.api.call()
+
+
+class FakeMember:
+    def __init__(self, guild: "FakeGuild", user_id: int, name: str, moderator: bool = False):
+        self.guild = guild
+        self.id = user_id
+        self.name = name
+        self.roles: list[FakeRole] = []
+        self.guild_permissions = FakePermissions(moderator)
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self) -> str:
+        return self.name
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.api.call()
+
+    async def add_roles(self, *roles, reason=None):
+        await self.guild.api.call()
+        for role in roles:
+            if role not in self.roles:
+                self.roles.append(role)
+
+    async def remove_roles(self, *roles, reason=None):
+        await self.guild.api.call()
+        self.roles = [r for r in self.roles if r not in roles]
+
+    async def ban(self, reason=None):
+        await self.guild.api.call()
+        self.guild.bans.add(self.id)
+
+    async def kick(self, reason=None):
+        await self.guild.api.call()
+
+
+class FakeGuild:
+    def __init__(self, api: FakeAPI, guild_id: int, log_channel: str):
+        self.api = api
+        self.id = guild_id
+        self.name = "Replay Guild"
+        self.roles: list[FakeRole] = []
+        self.channels = [FakeChannel(api, 1, "general"), FakeChannel(api, 2, log_channel)]
+        self.members: dict[int, FakeMember] = {}
+        self.bans: set[int] = set()
+
+    @property
+    def text_channels(self) -> list[FakeChannel]:
+        return self.channels
+
+    def member(self, user_id: int, name: str, moderator: bool = False) -> FakeMember:
+        m = self.members.get(user_id)
+        if m is None:
+            m = FakeMember(self, user_id, name, moderator)
+            self.members[user_id] = m
+        return m
+
+    def get_channel(self, channel_id: int):
+        for ch in self.channels:
+            if ch.id == channel_id:
+                return ch
+        return None
+
+    async def fetch_channel(self, channel_id: int):
+        await self.api.call()
+        ch = self.get_channel(channel_id)
+        if ch is None:
+            raise LookupError(f"Unknown channel {channel_id}")
+        return ch
+
+    async def create_role(self, name: str, reason=None) -> FakeRole:
+        await self.api.call()
+        role = FakeRole(len(self.roles) + 1, name)
+        self.roles.append(role)
+        return role
+
+    async def unban(self, user, reason=None):
+        await self.api.call()
+        if user.id not in self.bans:
+            raise LookupError(f"Unknown ban {user.id}")
+        self.bans.discard(user.id)
+
+
+class FakeResponse:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+
+    async def send_message(self, content=None, ephemeral: bool = False, **kwargs):
+        await self.api.call()
+
+
+class FakeInteraction:
+    def __init__(self, guild: FakeGuild, user: FakeMember):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.channel = guild.channels[0]
+        self.response = FakeResponse(guild.api)
+
+
+# ----------------------
+# Подмена окружения бота
+# ----------------------
+class ScaledAsyncio:
+    """Модуль asyncio для bot.py, в котором таймеры (asyncio.sleep) идут быстрее в speed раз."""
+
+    def __init__(self, speed: float):
+        self._speed = speed
+
+    async def sleep(self, delay, result=None):
+        return await asyncio.sleep(delay / self._speed, result)
+
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+
+class TimerLoop:
+    """Обёртка над циклом событий для bot.loop: запоминает задачи авто-размута/разбана."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self.timers: set[asyncio.Task] = set()
+        self.created = 0
+        self.max_pending = 0
+
+    def create_task(self, coro, **kwargs):
+        task = self._loop.create_task(coro, **kwargs)
+        self.created += 1
+        self.timers.add(task)
+        self.max_pending = max(self.max_pending, len(self.timers))
+        task.add_done_callback(self.timers.discard)
+        return task
+
+    def __getattr__(self, name):
+        return getattr(self._loop, name)
+
+
+class Replayer:
+    def __init__(self, events: list[ReplayEvent], speed: float, workdir: str, api_latency: float,
+                 sample_interval: float, guild_id: int, trace_memory: bool = False):
+        self.events = events
+        self.speed = speed
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.api = FakeAPI(api_latency)
+        self.guild = FakeGuild(self.api, guild_id, str(bot_module.config.get("log_channel", "logs")))
+        self.warnings_file = os.path.join(workdir, "warnings.json")
+        self.settings_file = os.path.join(workdir, "settings.json")
+        self.log_file = os.path.join(workdir, "logs.txt")
+
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors: list[str] = []
+        self.latencies: list[float] = []
+        self.in_flight: set[asyncio.Task] = set()
+        self.max_in_flight = 0
+        self.peak_mem_kb: float | None = None
+        self.moderator_ids: dict[str, int] = {}
+        self.samples: list[dict] = []
+        self.timer_loop: TimerLoop | None = None
+
+    def _install(self) -> None:
+        with open(self.warnings_file, "w", encoding="utf-8") as f:
+            json.dump({}, f)
+        bot_module.asyncio = ScaledAsyncio(self.speed)
+        bot_module.warnings_store = bot_module.PersistentWarnings(self.warnings_file)
+        bot_module.settings_store = bot_module.PersistentSettings(self.settings_file)
+        bot_module.logger = bot_module.Logger(self.log_file)
+
+        async def fetch_user(user_id: int):
+            await self.api.call()
+            return self.guild.member(user_id, f"user{user_id}")
+
+        bot_module.bot.fetch_user = fetch_user
+        self.timer_loop = TimerLoop(asyncio.get_running_loop())
+        bot_module.bot.loop = self.timer_loop
+
+    async def _invoke(self, ev: ReplayEvent) -> None:
+        cmd = bot_module.bot.tree.get_command(ev.command)
+        if cmd is None:
+            raise LookupError(f"Неизвестная команда: {ev.command}")
+        moderator_id = self.moderator_ids.setdefault(ev.moderator, 900000000000000000 + len(self.moderator_ids))
+        interaction = FakeInteraction(self.guild, self.guild.member(moderator_id, ev.moderator, moderator=True))
+        for check in cmd.checks:
+            if not await check(interaction):
+                return
+
+        member = None
+        if ev.user_id is not None:
+            member = self.guild.member(ev.user_id, ev.user or f"user{ev.user_id}")
+
+        if ev.command in ("warn", "kick"):
+            await cmd.callback(interaction, member, ev.reason)
+        elif ev.command in ("mute", "ban"):
+            await cmd.callback(interaction, member, ev.duration, ev.reason)
+        elif ev.command in ("unwarn", "unmute", "warnings"):
+            await cmd.callback(interaction, member)
+        elif ev.command == "unban":
+            await cmd.callback(interaction, str(ev.user_id))
+        elif ev.command == "say":
+            await cmd.callback(interaction, ev.content, None)
+
+    async def _run(self, ev: ReplayEvent) -> None:
+        started = time.perf_counter()
+        try:
+            await self._invoke(ev)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            if len(self.errors) < 10:
+                self.errors.append(f"{ev.command}: {e!r}")
+        self.latencies.append(time.perf_counter() - started)
+
+    def _bot_memory_kb(self) -> float | None:
+        # Считаем только аллокации, в стеке которых есть bot.py, — без учёта данных самого реплея
+        if not self.trace_memory:
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(True, bot_module.__file__, all_frames=True)]
+        )
+        current = sum(trace.size for trace in snapshot.traces) / 1024
+        self.peak_mem_kb = max(self.peak_mem_kb or 0.0, current)
+        return current
+
+    def _sample(self, wall: float) -> dict:
+        mem_kb = self._bot_memory_kb()
+        try:
+            storage = os.path.getsize(self.warnings_file)
+        except OSError:
+            storage = 0
+        prev = self.samples[-1] if self.samples else {"wall": 0.0, "done": 0}
+        done = self.completed + self.failed
+        window = wall - prev["wall"]
+        sample = {
+            "wall": wall,
+            "virtual": wall * self.speed,
+            "dispatched": self.dispatched,
+            "done": done,
+            "failed": self.failed,
+            "in_flight": len(self.in_flight),
+            "timers": len(self.timer_loop.timers),
+            "throughput": (done - prev["done"]) / window if window > 0 else 0.0,
+            "mem_kb": mem_kb,
+            "peak_kb": self.peak_mem_kb,
+            "storage_bytes": storage,
+        }
+        self.samples.append(sample)
+        return sample
+
+    async def _sampler(self, started: float) -> None:
+        print_sample_header()
+        while True:
+            await asyncio.sleep(self.sample_interval)
+            print_sample(self._sample(time.perf_counter() - started))
+
+    async def run(self, drain_timers: bool) -> dict:
+        if self.trace_memory:
+            tracemalloc.start(TRACE_DEPTH)
+        self._install()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        sampler = loop.create_task(self._sampler(started))
+        try:
+            for ev in self.events:
+                delay = ev.offset / self.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = loop.create_task(self._run(ev))
+                self.in_flight.add(task)
+                self.max_in_flight = max(self.max_in_flight, len(self.in_flight))
+                task.add_done_callback(self.in_flight.discard)
+                self.dispatched += 1
+            if self.in_flight:
+                await asyncio.wait(set(self.in_flight))
+            if drain_timers:
+                while self.timer_loop.timers:
+                    await asyncio.wait(set(self.timer_loop.timers))
+        finally:
+            sampler.cancel()
+        final = self._sample(time.perf_counter() - started)
+        print_sample(final)
+        pending_timers = len(self.timer_loop.timers)
+        for task in list(self.timer_loop.timers):
+            task.cancel()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+        lat = sorted(self.latencies)
+        return {
+            "events": len(self.events),
+            "speed": self.speed,
+            "wall_seconds": final["wall"],
+            "completed": self.completed,
+            "failed": self.failed,
+            "throughput": (self.completed + self.failed) / final["wall"] if final["wall"] > 0 else 0.0,
+            "latency_p50_ms": percentile(lat, 0.50) * 1000,
+            "latency_p95_ms": percentile(lat, 0.95) * 1000,
+            "latency_max_ms": (lat[-1] if lat else 0.0) * 1000,
+            "max_in_flight": self.max_in_flight,
+            "timers_created": self.timer_loop.created,
+            "timers_max_pending": self.timer_loop.max_pending,
+            "timers_pending": pending_timers,
+            "api_calls": self.api.calls,
+            "peak_mem_kb": final["peak_kb"],
+            "storage_bytes": final["storage_bytes"],
+            "errors": self.errors,
+            "samples": self.samples,
+        }
+
+
+# ----------------------
+# Отчёт
+# ----------------------
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def print_sample_header() -> None:
+    print(f"{'t, с':>7} {'вирт, с':>9} {'отпр':>6} {'готово':>6} {'ошиб':>5} "
+          f"{'в работе':>8} {'таймеры':>7} {'оп/с':>8} {'пам, КБ':>9} {'пик, КБ':>9} {'warnings.json, Б':>16}")
+
+
+def format_kb(value: float | None) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def print_sample(s: dict) -> None:
+    print(f"{s['wall']:>7.1f} {s['virtual']:>9.1f} {s['dispatched']:>6} {s['done']:>6} {s['failed']:>5} "
+          f"{s['in_flight']:>8} {s['timers']:>7} {s['throughput']:>8.1f} {format_kb(s['mem_kb']):>9} "
+          f"{format_kb(s['peak_kb']):>9} {s['storage_bytes']:>16}")
+
+
+def print_summary(report: dict) -> None:
+    print()
+    print(f"Событий: {report['events']} | Скорость: x{report['speed']:g} | Время: {report['wall_seconds']:.1f} с")
+    print(f"Выполнено: {report['completed']} | Ошибок: {report['failed']} | "
+          f"Пропускная способность: {report['throughput']:.1f} оп/с")
+    print(f"Задержка обработчика: p50 {report['latency_p50_ms']:.1f} мс | "
+          f"p95 {report['latency_p95_ms']:.1f} мс | max {report['latency_max_ms']:.1f} мс")
+    print(f"Макс. одновременно в работе: {report['max_in_flight']} | Вызовов API: {report['api_calls']}")
+    print(f"Таймеров создано: {report['timers_created']} | Макс. ожидающих: {report['timers_max_pending']} | "
+          f"Не истекло к концу: {report['timers_pending']}")
+    print(f"Пик памяти bot.py: {format_kb(report['peak_mem_kb'])} КБ | "
+          f"Размер warnings.json: {report['storage_bytes']} Б")
+    for err in report["errors"]:
+        print(f"  ❌ {err}")
+
+
+# ----------------------
+# Запуск
+# ----------------------
+def speed_type(value: str) -> float:
+    v = float(value)
+    if not 1 <= v <= 100:
+        raise argparse.ArgumentTypeError("скорость должна быть от 1 до 100")
+    return v
+
+
+def positive_int(value: str) -> int:
+    v = int(value)
+    if v <= 0:
+        raise argparse.ArgumentTypeError("значение должно быть больше 0")
+    return v
+
+
+def positive_float(value: str) -> float:
+    v = float(value)
+    if v <= 0:
+        raise argparse.ArgumentTypeError("значение должно быть больше 0")
+    return v
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Воспроизведение модерации из data/logs.txt или синтетического профиля против обработчиков бота",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--log", default=bot_module.LOG_FILE, help="файл логов для воспроизведения")
+    source.add_argument("--profile", choices=["steady", "raid"], help="синтетический профиль вместо логов")
+    parser.add_argument("--events", type=positive_int, default=500, help="число событий в профиле")
+    parser.add_argument("--duration", type=positive_float, default=600.0, help="длительность профиля в виртуальных секундах")
+    parser.add_argument("--users", type=positive_int, default=50, help="число пользователей в профиле")
+    parser.add_argument("--seed", type=int, default=0, help="seed генератора профиля")
+    parser.add_argument("--max-gap", type=float, default=60.0, help="макс. пауза между строками лога, с")
+    parser.add_argument("--speed", type=speed_type, default=1.0, help="ускорение от 1 до 100")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="имитация задержки API Discord, мс")
+    parser.add_argument("--sample-interval", type=positive_float, default=1.0, help="период замеров, с")
+    parser.add_argument("--guild-id", type=int, default=1, help="ID сервера-заглушки")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="замерять память bot.py через tracemalloc (замедляет, искажает задержки)")
+    parser.add_argument("--drain-timers", action="store_true", help="дождаться всех авто-размутов/разбанов")
+    parser.add_argument("--workdir", help="каталог для warnings.json/settings.json/logs.txt (по умолчанию временный)")
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.profile:
+        events = generate_profile(args.profile, args.events, args.duration, args.users, args.seed)
+    else:
+        events = load_log_events(args.log, args.max_gap)
+    if not events:
+        raise SystemExit("Нет событий для воспроизведения.")
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        workdir_ctx = contextlib.nullcontext(args.workdir)
+    else:
+        workdir_ctx = tempfile.TemporaryDirectory()
+    with workdir_ctx as workdir:
+        replayer = Replayer(events, args.speed, workdir, args.api_latency / 1000,
+                            args.sample_interval, args.guild_id, args.trace_memory)
+        report = asyncio.run(replayer.run(args.drain_timers))
+
+    print_summary(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()